@@ -1,13 +1,97 @@
 import gradio as gr
 import openai
 import os
+import json
+import hashlib
 from dotenv import load_dotenv
 import re
-from typing import Dict, List, Tuple
+import functools
+from collections import OrderedDict, namedtuple
+from typing import AsyncIterator, Dict, List, Tuple
 
 # Load environment variables
 load_dotenv()
 
+# Process-wide OpenAI client, or None when no API key is configured
+_api_key = os.getenv("OPENAI_API_KEY")
+if _api_key and _api_key != "your_openai_api_key_here":
+    _OPENAI_CLIENT = openai.AsyncOpenAI(api_key=_api_key, max_retries=1, timeout=10.0)
+else:
+    _OPENAI_CLIENT = None
+
+# Story structure patterns, compiled once at import and matched against the lowercased story
+_USER_STORY_RE = re.compile(r'as\s+a\s+\w+.*?i\s+want\s+.*?so\s+that\s+.*')
+# Persona, action, value and criteria detection fused into one pass; group names are the analysis keys
+_STRUCTURE_RE = re.compile(
+    r'(?P<has_persona>as\s+(?:a|an|the)\s+(?=\w))'
+    r'|(?P<has_action>i\s+(?:want|need|can|should)\s+)'
+    r'|(?P<has_value>so\s+that\s+|in\s+order\s+to\s+|\bto\s+(?=\w))'
+    r'|(?P<has_acceptance_criteria>given\s+|when\s+|then\s+|acceptance\s+criteria|criteria:)'
+)
+
+# One INVEST criterion's result; suggestions is a tuple so cached results can be shared safely
+Criterion = namedtuple('Criterion', 'name score feedback suggestions')
+
+# Keywords for the Independent and Negotiable checks, looked up in the story's set of lowercase words
+_WORD_RE = re.compile(r'[a-z]+')
+_DEPENDENCY_TERMS = frozenset({'depends', 'requires', 'after', 'before'})
+_RIGID_TERMS = frozenset({'must', 'shall', 'will', 'exactly', 'precisely', 'specifically'})
+
+# OpenAI model for the combined analysis, how many finished responses to keep in memory,
+# and the shortest story (in words) worth sending
+_AI_MODEL = "gpt-4o-mini"
+_AI_CACHE_SIZE = 512
+_MIN_AI_WORDS = 5
+
+# Score bar for each possible criterion score (0-3), the overall emoji per 20% band,
+# and the best possible total (6 criteria, 3 points each)
+_SCORE_BARS = ("░░░", "█░░", "██░", "███")
+_SCORE_EMOJIS = ("🔴", "🔴", "🔴", "🟡", "🟢", "🟢")
+_MAX_TOTAL = 18
+
+# String fields of the combined AI response, matched while the JSON is still streaming in
+_ANALYSIS_FIELD_RE = re.compile(r'"analysis"\s*:\s*"((?:[^"\\]|\\.)*)')
+_IMPROVED_FIELD_RE = re.compile(r'"improved_story"\s*:\s*"((?:[^"\\]|\\.)*)')
+_DANGLING_ESCAPE_RE = re.compile(r'(?:\\u[dD][89abAB][0-9a-fA-F]{2})?(?:\\u[0-9a-fA-F]{0,3})?$')
+
+def _partial_json_field(raw: str, pattern: re.Pattern) -> str:
+    """Decode a string field from possibly incomplete JSON; empty if it hasn't started or can't be decoded yet"""
+    match = pattern.search(raw)
+    if not match:
+        return ""
+    try:
+        return json.loads('"' + _DANGLING_ESCAPE_RE.sub('', match.group(1)) + '"')
+    except ValueError:
+        return ""
+
+@functools.lru_cache(maxsize=512)
+def _story_structure(story_lc: str) -> Tuple[Tuple[str, any], ...]:
+    """Memoized structure analysis of the lowercased story, stored as frozen items so cache entries can't be mutated"""
+    analysis = {
+        'has_persona': False,
+        'has_action': False,
+        'has_value': False,
+        'has_acceptance_criteria': False,
+        'word_count': len(story_lc.split()),
+        'sentence_count': 1 + sum(map(story_lc.count, '.!?')),
+        'has_user_story_format': False
+    }
+    
+    # Check for user story format: "As a [persona], I want [action] so that [value]"
+    if _USER_STORY_RE.search(story_lc):
+        analysis['has_user_story_format'] = True
+        
+    # Check for persona, action (want/need), value proposition and acceptance criteria
+    found = 0
+    for match in _STRUCTURE_RE.finditer(story_lc):
+        if not analysis[match.lastgroup]:
+            analysis[match.lastgroup] = True
+            found += 1
+            if found == 4:
+                break
+            
+    return tuple(analysis.items())
+
 class INVESTEvaluator:
     """
     Evaluates user stories against INVEST criteria:
@@ -20,230 +104,135 @@ class INVESTEvaluator:
     """
     
     def __init__(self):
-        api_key = os.getenv("OPENAI_API_KEY")
-        if api_key and api_key != "your_openai_api_key_here":
-            self.client = openai.OpenAI(api_key=api_key)
-        else:
-            self.client = None
+        # Share one client (and its connection pool) across every evaluator in the process
+        self.client = _OPENAI_CLIENT
         
-    def analyze_story_structure(self, story: str) -> Dict[str, any]:
-        """Analyze the basic structure of the user story"""
-        analysis = {
-            'has_persona': False,
-            'has_action': False,
-            'has_value': False,
-            'has_acceptance_criteria': False,
-            'word_count': len(story.split()),
-            'sentence_count': len(re.split(r'[.!?]+', story)),
-            'has_user_story_format': False
-        }
+        # Finished AI responses keyed by a hash of the normalized story, least recently used first
+        self._ai_cache = OrderedDict()
         
-        # Check for user story format: "As a [persona], I want [action] so that [value]"
-        user_story_pattern = r'as\s+a\s+\w+.*?i\s+want\s+.*?so\s+that\s+.*'
-        if re.search(user_story_pattern, story.lower()):
-            analysis['has_user_story_format'] = True
-            
-        # Check for persona
-        persona_patterns = [r'as\s+a\s+(\w+)', r'as\s+an\s+(\w+)', r'as\s+the\s+(\w+)']
-        for pattern in persona_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_persona'] = True
-                break
-                
-        # Check for action (want/need)
-        action_patterns = [r'i\s+want\s+', r'i\s+need\s+', r'i\s+can\s+', r'i\s+should\s+']
-        for pattern in action_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_action'] = True
-                break
-                
-        # Check for value proposition
-        value_patterns = [r'so\s+that\s+', r'in\s+order\s+to\s+', r'to\s+']
-        for pattern in value_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_value'] = True
-                break
-                
-        # Check for acceptance criteria
-        criteria_patterns = [r'given\s+', r'when\s+', r'then\s+', r'acceptance\s+criteria', r'criteria:']
-        for pattern in criteria_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_acceptance_criteria'] = True
-                break
-                
-        return analysis
+    def analyze_story_structure(self, story: str, story_lc: str = None) -> Dict[str, any]:
+        """Analyze the basic structure of the user story; pass story_lc if the lowercased story is already at hand"""
+        return dict(_story_structure(story_lc if story_lc is not None else story.lower()))
     
-    def evaluate_invest_criteria(self, story: str) -> Dict[str, Dict]:
+    def evaluate_invest_criteria(self, story: str) -> Tuple[Criterion, ...]:
         """Evaluate the story against each INVEST criterion"""
-        structure = self.analyze_story_structure(story)
-        
-        criteria = {
-            'Independent': {
-                'score': 0,
-                'feedback': '',
-                'suggestions': []
-            },
-            'Negotiable': {
-                'score': 0,
-                'feedback': '',
-                'suggestions': []
-            },
-            'Valuable': {
-                'score': 0,
-                'feedback': '',
-                'suggestions': []
-            },
-            'Estimable': {
-                'score': 0,
-                'feedback': '',
-                'suggestions': []
-            },
-            'Small': {
-                'score': 0,
-                'feedback': '',
-                'suggestions': []
-            },
-            'Testable': {
-                'score': 0,
-                'feedback': '',
-                'suggestions': []
-            }
-        }
+        return self._invest_criteria(story)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _invest_criteria(story: str) -> Tuple[Criterion, ...]:
+        """Memoized INVEST evaluation; repeated keystrokes on the same text skip the analysis"""
+        # Lowercase once; the keyword set and the structure analysis both reuse it
+        story_lc = story.lower()
+        words = frozenset(_WORD_RE.findall(story_lc))
+        structure = dict(_story_structure(story_lc))
         
         # Independent: Check if story can stand alone
-        if structure['has_user_story_format'] and not any(word in story.lower() for word in ['depends on', 'requires', 'after', 'before']):
-            criteria['Independent']['score'] = 3
-            criteria['Independent']['feedback'] = "Story appears to be independent"
+        if structure['has_user_story_format'] and words.isdisjoint(_DEPENDENCY_TERMS):
+            independent = Criterion('Independent', 3, "Story appears to be independent", ())
         elif structure['has_user_story_format']:
-            criteria['Independent']['score'] = 2
-            criteria['Independent']['feedback'] = "Story has dependencies mentioned"
-            criteria['Independent']['suggestions'].append("Consider breaking down dependencies into separate stories")
+            independent = Criterion('Independent', 2, "Story has dependencies mentioned",
+                                    ("Consider breaking down dependencies into separate stories",))
         else:
-            criteria['Independent']['score'] = 1
-            criteria['Independent']['feedback'] = "Story structure unclear for independence assessment"
-            criteria['Independent']['suggestions'].append("Use standard user story format: 'As a [persona], I want [action] so that [value]'")
+            independent = Criterion('Independent', 1, "Story structure unclear for independence assessment",
+                                    ("Use standard user story format: 'As a [persona], I want [action] so that [value]'",))
         
         # Negotiable: Check for flexibility
-        rigid_terms = ['must', 'shall', 'will', 'exactly', 'precisely', 'specifically']
-        if any(term in story.lower() for term in rigid_terms):
-            criteria['Negotiable']['score'] = 1
-            criteria['Negotiable']['feedback'] = "Story contains rigid language that limits negotiation"
-            criteria['Negotiable']['suggestions'].append("Use more flexible language like 'should' or 'could'")
+        if not words.isdisjoint(_RIGID_TERMS):
+            negotiable = Criterion('Negotiable', 1, "Story contains rigid language that limits negotiation",
+                                   ("Use more flexible language like 'should' or 'could'",))
         elif structure['has_user_story_format']:
-            criteria['Negotiable']['score'] = 3
-            criteria['Negotiable']['feedback'] = "Story uses negotiable language"
+            negotiable = Criterion('Negotiable', 3, "Story uses negotiable language", ())
         else:
-            criteria['Negotiable']['score'] = 2
-            criteria['Negotiable']['feedback'] = "Story format could be more negotiable"
-            criteria['Negotiable']['suggestions'].append("Use user story format for better negotiation")
+            negotiable = Criterion('Negotiable', 2, "Story format could be more negotiable",
+                                   ("Use user story format for better negotiation",))
         
         # Valuable: Check for clear value proposition
         if structure['has_value'] and structure['has_persona']:
-            criteria['Valuable']['score'] = 3
-            criteria['Valuable']['feedback'] = "Story clearly states value to user"
+            valuable = Criterion('Valuable', 3, "Story clearly states value to user", ())
         elif structure['has_value']:
-            criteria['Valuable']['score'] = 2
-            criteria['Valuable']['feedback'] = "Value stated but persona unclear"
-            criteria['Valuable']['suggestions'].append("Specify who benefits from this story")
+            valuable = Criterion('Valuable', 2, "Value stated but persona unclear",
+                                 ("Specify who benefits from this story",))
         else:
-            criteria['Valuable']['score'] = 1
-            criteria['Valuable']['feedback'] = "Value proposition unclear"
-            criteria['Valuable']['suggestions'].append("Add 'so that [benefit]' to explain the value")
+            valuable = Criterion('Valuable', 1, "Value proposition unclear",
+                                 ("Add 'so that [benefit]' to explain the value",))
         
         # Estimable: Check for sufficient detail
         if structure['word_count'] > 20 and structure['has_acceptance_criteria']:
-            criteria['Estimable']['score'] = 3
-            criteria['Estimable']['feedback'] = "Story has sufficient detail for estimation"
+            estimable = Criterion('Estimable', 3, "Story has sufficient detail for estimation", ())
         elif structure['word_count'] > 10:
-            criteria['Estimable']['score'] = 2
-            criteria['Estimable']['feedback'] = "Story has basic detail but could use acceptance criteria"
-            criteria['Estimable']['suggestions'].append("Add acceptance criteria to improve estimability")
+            estimable = Criterion('Estimable', 2, "Story has basic detail but could use acceptance criteria",
+                                  ("Add acceptance criteria to improve estimability",))
         else:
-            criteria['Estimable']['score'] = 1
-            criteria['Estimable']['feedback'] = "Story lacks detail for estimation"
-            criteria['Estimable']['suggestions'].append("Add more detail and acceptance criteria")
+            estimable = Criterion('Estimable', 1, "Story lacks detail for estimation",
+                                  ("Add more detail and acceptance criteria",))
         
         # Small: Check story size
         if 10 <= structure['word_count'] <= 50:
-            criteria['Small']['score'] = 3
-            criteria['Small']['feedback'] = "Story is appropriately sized"
+            small = Criterion('Small', 3, "Story is appropriately sized", ())
         elif structure['word_count'] < 10:
-            criteria['Small']['score'] = 1
-            criteria['Small']['feedback'] = "Story is too small/vague"
-            criteria['Small']['suggestions'].append("Add more detail to make the story meaningful")
+            small = Criterion('Small', 1, "Story is too small/vague",
+                              ("Add more detail to make the story meaningful",))
         else:
-            criteria['Small']['score'] = 2
-            criteria['Small']['feedback'] = "Story might be too large"
-            criteria['Small']['suggestions'].append("Consider breaking into smaller stories")
+            small = Criterion('Small', 2, "Story might be too large",
+                              ("Consider breaking into smaller stories",))
         
         # Testable: Check for testability
         if structure['has_acceptance_criteria'] and structure['has_action']:
-            criteria['Testable']['score'] = 3
-            criteria['Testable']['feedback'] = "Story has clear acceptance criteria"
+            testable = Criterion('Testable', 3, "Story has clear acceptance criteria", ())
         elif structure['has_action']:
-            criteria['Testable']['score'] = 2
-            criteria['Testable']['feedback'] = "Action clear but acceptance criteria missing"
-            criteria['Testable']['suggestions'].append("Add Given/When/Then acceptance criteria")
+            testable = Criterion('Testable', 2, "Action clear but acceptance criteria missing",
+                                 ("Add Given/When/Then acceptance criteria",))
         else:
-            criteria['Testable']['score'] = 1
-            criteria['Testable']['feedback'] = "Story lacks testable elements"
-            criteria['Testable']['suggestions'].append("Add clear actions and acceptance criteria")
+            testable = Criterion('Testable', 1, "Story lacks testable elements",
+                                 ("Add clear actions and acceptance criteria",))
         
-        return criteria
+        return independent, negotiable, valuable, estimable, small, testable
     
-    def get_ai_analysis(self, story: str) -> str:
-        """Get AI-powered analysis of the user story"""
+    def too_short_for_ai(self, story: str) -> bool:
+        """Check if the story is too short to be worth an OpenAI request"""
+        return self.analyze_story_structure(story)['word_count'] < _MIN_AI_WORDS
+    
+    async def combined_analysis(self, story: str) -> AsyncIterator[Tuple[str, str]]:
+        """Stream AI analysis and an improved story from a single JSON completion, yielding both texts received so far"""
+        if self.too_short_for_ai(story):
+            yield "Story too short for AI analysis. Add more detail and evaluate again.", ""
+            return
+        
         if not self.client:
-            return "AI analysis requires a valid OpenAI API key. Please add your API key to the .env file."
+            yield (
+                "AI analysis requires a valid OpenAI API key. Please add your API key to the .env file.",
+                "Story improvement requires a valid OpenAI API key. Please add your API key to the .env file."
+            )
+            return
+        
+        cache_key = hashlib.blake2b(f"{_AI_MODEL}:{story.strip().lower()}".encode(), digest_size=16).digest()
+        cached = self._ai_cache.get(cache_key)
+        if cached is not None:
+            self._ai_cache.move_to_end(cache_key)
+            yield cached
+            return
         
         try:
             prompt = f"""
-            Analyze this user story for Agile development:
+            Review this user story for Agile development:
             
             "{story}"
             
-            Provide a comprehensive critique focusing on:
+            Return a JSON object with exactly two string fields:
+            
+            "analysis": a constructive, specific critique focusing on
             1. Story structure and clarity
             2. INVEST criteria compliance
             3. Specific improvement suggestions
             4. Potential scope issues
             
-            Be constructive and specific in your feedback.
-            """
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are an Agile coach and user story expert. Provide detailed, constructive feedback on user stories."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            return f"AI analysis unavailable: {str(e)}. Please check your OpenAI API key."
-    
-    def generate_improved_story(self, story: str) -> str:
-        """Generate an improved version of the user story"""
-        if not self.client:
-            return "Story improvement requires a valid OpenAI API key. Please add your API key to the .env file."
-        
-        try:
-            prompt = f"""
-            Improve this user story to better comply with INVEST criteria:
-            
-            Original: "{story}"
-            
-            Provide an improved version that:
+            "improved_story": an improved version of the story that
             1. Uses proper user story format
             2. Is independent, negotiable, valuable, estimable, small, and testable
             3. Includes acceptance criteria
             4. Has clear scope and value proposition
-            
-            Format your response as:
+            formatted as:
             IMPROVED STORY:
             [improved story]
             
@@ -251,66 +240,86 @@ class INVESTEvaluator:
             [criteria]
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = await self.client.chat.completions.create(
+                model=_AI_MODEL,
                 messages=[
-                    {"role": "system", "content": "You are an Agile coach. Improve user stories to meet INVEST criteria."},
+                    {"role": "system", "content": "You are an Agile coach and user story expert. Provide detailed, constructive feedback on user stories and improve them to meet INVEST criteria. Respond in JSON."},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=400,
-                temperature=0.7
+                max_tokens=550,
+                temperature=0.3,
+                response_format={"type": "json_object"},
+                stream=True
             )
             
-            return response.choices[0].message.content
+            raw = ""
+            analysis, improved_story = "", ""
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    raw += chunk.choices[0].delta.content
+                    analysis = _partial_json_field(raw, _ANALYSIS_FIELD_RE) or analysis
+                    improved_story = _partial_json_field(raw, _IMPROVED_FIELD_RE) or improved_story
+                    yield analysis, improved_story
+            
+            # A response cut off by max_tokens won't parse; keep the partial fields in that case
+            try:
+                result = json.loads(raw)
+            except ValueError:
+                return
+            # Likewise if the fields aren't plain strings, which Markdown can't render
+            if not isinstance(result, dict):
+                return
+            result = (result.get("analysis", analysis), result.get("improved_story", improved_story))
+            if not all(isinstance(text, str) for text in result):
+                return
+            
+            self._ai_cache[cache_key] = result
+            if len(self._ai_cache) > _AI_CACHE_SIZE:
+                self._ai_cache.popitem(last=False)
+            yield result
             
         except Exception as e:
-            return f"Story improvement unavailable: {str(e)}. Please check your OpenAI API key."
+            yield (
+                f"AI analysis unavailable: {str(e)}. Please check your OpenAI API key.",
+                f"Story improvement unavailable: {str(e)}. Please check your OpenAI API key."
+            )
+
+def format_invest_feedback(criteria: Tuple[Criterion, ...]) -> str:
+    """Render INVEST results as Markdown: the overall score, then one block per criterion"""
+    # Calculate overall score
+    total_score = sum(c.score for c in criteria)
+    overall_score = total_score * (100.0 / _MAX_TOTAL)
+    score_emoji = _SCORE_EMOJIS[int(overall_score // 20)]
+    
+    # Create detailed feedback, one preformatted block per criterion
+    feedback_blocks = (
+        f"**{c.name}**: {_SCORE_BARS[c.score]} ({c.score}/3)\n*{c.feedback}*\n"
+        + ("💡 Suggestions:\n" + "".join(f"   • {suggestion}\n" for suggestion in c.suggestions)
+           if c.suggestions else "")
+        for c in criteria
+    )
+    
+    return f"{score_emoji} **Overall INVEST Score: {overall_score:.1f}%**\n\n" + "\n".join(feedback_blocks)
 
 def create_gradio_interface():
     """Create the Gradio web interface"""
     evaluator = INVESTEvaluator()
     
-    def evaluate_story(story_text):
+    def score_story(story_text):
+        """Build the INVEST feedback for a story; cheap enough to run on every edit"""
         if not story_text.strip():
-            return "Please enter a user story to evaluate.", "", ""
-        
-        # Get INVEST evaluation
-        criteria = evaluator.evaluate_invest_criteria(story_text)
-        
-        # Create detailed feedback
-        feedback_parts = []
-        total_score = 0
-        
-        for criterion, data in criteria.items():
-            score = data['score']
-            total_score += score
-            max_score = 3
-            
-            # Create score visualization
-            score_bars = "█" * score + "░" * (max_score - score)
-            
-            feedback_parts.append(f"**{criterion}**: {score_bars} ({score}/{max_score})")
-            feedback_parts.append(f"*{data['feedback']}*")
-            
-            if data['suggestions']:
-                feedback_parts.append("💡 Suggestions:")
-                for suggestion in data['suggestions']:
-                    feedback_parts.append(f"   • {suggestion}")
-            feedback_parts.append("")
-        
-        # Calculate overall score
-        overall_score = (total_score / (len(criteria) * 3)) * 100
-        score_emoji = "🟢" if overall_score >= 80 else "🟡" if overall_score >= 60 else "🔴"
-        
-        feedback = f"{score_emoji} **Overall INVEST Score: {overall_score:.1f}%**\n\n" + "\n".join(feedback_parts)
+            return "Please enter a user story to evaluate."
         
-        # Get AI analysis
-        ai_analysis = evaluator.get_ai_analysis(story_text)
-        
-        # Get improved story
-        improved_story = evaluator.generate_improved_story(story_text)
+        return format_invest_feedback(evaluator.evaluate_invest_criteria(story_text))
+    
+    async def ai_feedback(story_text):
+        """Stream AI analysis and improved story; runs after the INVEST score is already shown"""
+        if not story_text.strip():
+            yield "", ""
+            return
         
-        return feedback, ai_analysis, improved_story
+        async for ai_analysis, improved_story in evaluator.combined_analysis(story_text):
+            yield ai_analysis, improved_story
     
     # Create Gradio interface
     with gr.Blocks(title="Agile Story Evaluator", theme=gr.themes.Soft()) as interface:
@@ -345,18 +354,22 @@ def create_gradio_interface():
             with gr.Column():
                 improved_story = gr.Markdown(label="✨ Improved Story")
         
-        # Event handlers
+        # Event handlers - show the INVEST score immediately, then stream the AI output
         evaluate_btn.click(
-            fn=evaluate_story,
+            fn=score_story,
+            inputs=[story_input],
+            outputs=[invest_feedback]
+        ).then(
+            fn=ai_feedback,
             inputs=[story_input],
-            outputs=[invest_feedback, ai_analysis, improved_story]
+            outputs=[ai_analysis, improved_story]
         )
         
-        # Auto-evaluate on text change (with debouncing)
+        # Live INVEST scoring on text change; the OpenAI calls only run on click
         story_input.change(
-            fn=evaluate_story,
+            fn=score_story,
             inputs=[story_input],
-            outputs=[invest_feedback, ai_analysis, improved_story]
+            outputs=[invest_feedback]
         )
     
     return interface
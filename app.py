@@ -6,9 +6,41 @@ Railway deployment version of Agile Story Evaluator
 import os
 import time
 import random
+import threading
 import gradio as gr
-from collections import defaultdict
-from agile_story_evaluator import INVESTEvaluator as BaseINVESTEvaluator
+from collections import OrderedDict
+from typing import Tuple
+from agile_story_evaluator import INVESTEvaluator as BaseINVESTEvaluator, format_invest_feedback
+
+def _build_captcha(num1: int, num2: int, operation: str) -> Tuple[str, int]:
+    """Build a math CAPTCHA question and its answer"""
+    if operation == '+':
+        answer = num1 + num2
+        question = f"{num1} + {num2} = ?"
+    elif operation == '-':
+        # Ensure positive result
+        if num1 < num2:
+            num1, num2 = num2, num1
+        answer = num1 - num2
+        question = f"{num1} - {num2} = ?"
+    else:  # multiplication
+        answer = num1 * num2
+        question = f"{num1} × {num2} = ?"
+    
+    return question, answer
+
+# Every CAPTCHA for operands 1-10, built once so generating one is a single random.choice.
+# Each operand/operation combination appears once, so the odds match drawing them separately.
+_CAPTCHAS = tuple(
+    _build_captcha(num1, num2, operation)
+    for num1 in range(1, 11)
+    for num2 in range(1, 11)
+    for operation in ('+', '-', '*')
+)
+
+# After this many wrong CAPTCHA answers within the window (seconds), stop issuing new questions
+_MAX_CAPTCHA_FAILURES = 5
+_CAPTCHA_FAILURE_WINDOW = 60
 
 class INVESTEvaluator(BaseINVESTEvaluator):
     """Railway deployment version with rate limiting"""
@@ -16,61 +48,265 @@ class INVESTEvaluator(BaseINVESTEvaluator):
     def __init__(self):
         super().__init__()
         
-        # Rate limiting
-        self.usage_tracker = defaultdict(list)
+        # Rate limiting - per-user sliding-window counters, one per limit, each stored as
+        # (window index, count in that window, count in the window before). That tuple pair is
+        # all that's kept per user, however many requests they send, and users are kept in
+        # least-recently-seen order so the tracker can't grow without bound.
         self.max_requests_per_minute = 10
         self.max_requests_per_hour = 100
+        self.max_tracked_users = 10000
+        self.usage_tracker = OrderedDict()
+        
+        # Session hashes are chosen by the client, so a process-wide counter pair also caps
+        # total OpenAI traffic however many sessions a caller invents
+        self.max_total_requests_per_minute = 10
+        self.max_total_requests_per_hour = 100
+        self._total_usage = ((0, 0, 0), (0, 0, 0))
+        self._rate_limit_lock = threading.Lock()
+        self._last_sweep = time.time()
+    
+    @staticmethod
+    def _slide_window(counter: tuple, current_time: float, length: int) -> Tuple[tuple, float]:
+        """Advance a (window, count, previous count) counter to now and estimate the rate over the last window length"""
+        window, count, previous = counter
+        now_window = int(current_time // length)
+        if now_window != window:
+            previous = count if now_window == window + 1 else 0
+            count = 0
+            window = now_window
+        
+        # Weight the previous window by how much of it still overlaps the sliding window
+        estimate = previous * (1 - (current_time % length) / length) + count
+        return (window, count, previous), estimate
     
     def check_rate_limit(self, user_id: str = "anonymous") -> bool:
         """Check if user has exceeded rate limits"""
         current_time = time.time()
         
-        # Clean old entries
-        self.usage_tracker[user_id] = [
-            timestamp for timestamp in self.usage_tracker[user_id]
-            if current_time - timestamp < 3600  # Keep last hour
-        ]
-        
-        # Check limits
-        recent_requests = [
-            timestamp for timestamp in self.usage_tracker[user_id]
-            if current_time - timestamp < 60  # Last minute
-        ]
-        
-        if len(recent_requests) >= self.max_requests_per_minute:
-            return False
-        
-        if len(self.usage_tracker[user_id]) >= self.max_requests_per_hour:
-            return False
-        
-        # Record this request
-        self.usage_tracker[user_id].append(current_time)
-        return True
+        # Check-and-record must be atomic, or concurrent requests can all slip under the limit
+        with self._rate_limit_lock:
+            # Every 5 minutes drop users whose counters have aged out completely
+            if current_time - self._last_sweep > 300:
+                self._sweep_idle_users(current_time)
+                self._last_sweep = current_time
+            
+            state = self.usage_tracker.get(user_id)
+            if state is None:
+                state = ((0, 0, 0), (0, 0, 0))
+            else:
+                self.usage_tracker.move_to_end(user_id)
+            
+            minute, minute_rate = self._slide_window(state[0], current_time, 60)
+            hour, hour_rate = self._slide_window(state[1], current_time, 3600)
+            total_minute, total_minute_rate = self._slide_window(self._total_usage[0], current_time, 60)
+            total_hour, total_hour_rate = self._slide_window(self._total_usage[1], current_time, 3600)
+            
+            allowed = (minute_rate < self.max_requests_per_minute and hour_rate < self.max_requests_per_hour
+                       and total_minute_rate < self.max_total_requests_per_minute
+                       and total_hour_rate < self.max_total_requests_per_hour)
+            if allowed:
+                # Record this request against the user and the process-wide total
+                minute = (minute[0], minute[1] + 1, minute[2])
+                hour = (hour[0], hour[1] + 1, hour[2])
+                total_minute = (total_minute[0], total_minute[1] + 1, total_minute[2])
+                total_hour = (total_hour[0], total_hour[1] + 1, total_hour[2])
+            
+            self._total_usage = (total_minute, total_hour)
+            self.usage_tracker[user_id] = (minute, hour)
+            if len(self.usage_tracker) > self.max_tracked_users:
+                self.usage_tracker.popitem(last=False)
+            return allowed
+    
+    def _sweep_idle_users(self, current_time: float):
+        """Evict users with no requests in the current or previous hour; caller must hold the rate-limit lock"""
+        current_hour = int(current_time // 3600)
+        # Entries are in last-seen order, so stop at the first user whose hourly counter still counts
+        while self.usage_tracker:
+            user_id, (_, (hour_window, _, _)) = next(iter(self.usage_tracker.items()))
+            if current_hour - hour_window < 2:
+                break
+            del self.usage_tracker[user_id]
+
+# Static page content, built once at import
+
+# Page styles
+_CSS = """
+.gradio-container {
+    max-width: 1200px !important;
+    margin: 0 auto !important;
+    font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif !important;
+}
+.main-header {
+    text-align: center;
+    padding: 2rem 0;
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+    color: white;
+    border-radius: 15px;
+    margin-bottom: 2rem;
+    box-shadow: 0 8px 32px rgba(102, 126, 234, 0.3);
+}
+.feature-card {
+    background: white;
+    border-radius: 15px;
+    padding: 1.5rem;
+    box-shadow: 0 4px 20px rgba(0, 0, 0, 0.08);
+    margin: 1rem 0;
+    border: 1px solid rgba(102, 126, 234, 0.1);
+    transition: transform 0.2s ease, box-shadow 0.2s ease;
+}
+.feature-card:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 8px 25px rgba(0, 0, 0, 0.15);
+}
+.captcha-section {
+    background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
+    border-radius: 10px;
+    padding: 1.5rem;
+    border: 2px solid #dee2e6;
+    margin: 1rem 0;
+}
+.evaluate-btn {
+    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
+    border: none !important;
+    border-radius: 10px !important;
+    padding: 12px 24px !important;
+    font-weight: 600 !important;
+    font-size: 16px !important;
+    transition: all 0.3s ease !important;
+}
+.evaluate-btn:hover {
+    transform: translateY(-2px) !important;
+    box-shadow: 0 8px 25px rgba(102, 126, 234, 0.4) !important;
+}
+.results-section, .ai-section, .improved-section {
+    background: #f8f9fa;
+    border-radius: 10px;
+    padding: 1rem;
+    border-left: 4px solid #667eea;
+    min-height: 200px;
+}
+.gradio-textbox {
+    border-radius: 8px !important;
+    border: 2px solid #e9ecef !important;
+    transition: border-color 0.3s ease !important;
+}
+.gradio-textbox:focus {
+    border-color: #667eea !important;
+    box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1) !important;
+}
+.github-link {
+    color: rgba(255, 255, 255, 0.9) !important;
+    text-decoration: none !important;
+    font-size: 0.9rem !important;
+    display: inline-flex !important;
+    align-items: center !important;
+    gap: 0.5rem !important;
+    padding: 0.5rem 1rem !important;
+    background: rgba(255, 255, 255, 0.15) !important;
+    border-radius: 8px !important;
+    transition: all 0.3s ease !important;
+    margin-top: 1rem !important;
+}
+.github-link:hover {
+    background: rgba(255, 255, 255, 0.25) !important;
+    transform: translateY(-2px) !important;
+}
+.github-link-footer {
+    color: #667eea !important;
+    text-decoration: none !important;
+    font-weight: 600 !important;
+    display: inline-flex !important;
+    align-items: center !important;
+    gap: 0.5rem !important;
+    transition: all 0.3s ease !important;
+}
+.github-link-footer:hover {
+    color: #764ba2 !important;
+    transform: translateY(-2px) !important;
+}
+"""
+
+# Page header with the GitHub link
+_HEADER_HTML = """
+<div class="main-header">
+    <h1 style="margin: 0; font-size: 2.5rem; font-weight: 700;">🎯 Agile Story Evaluator</h1>
+    <p style="margin: 0.5rem 0 0 0; font-size: 1.2rem; opacity: 0.9;">
+        Professional INVEST criteria analysis with AI-powered insights
+    </p>
+    <a href="https://github.com/cadebryant/agile-story-evaluator" target="_blank" class="github-link">
+        <svg width="16" height="16" fill="currentColor" viewBox="0 0 16 16" style="margin-right: 0.25rem;">
+            <path d="M8 0C3.58 0 0 3.58 0 8c0 3.54 2.29 6.53 5.47 7.59.4.07.55-.17.55-.38 0-.19-.01-.82-.01-1.49-2.01.37-2.53-.49-2.69-.94-.09-.23-.48-.94-.82-1.13-.28-.15-.68-.52-.01-.53.63-.01 1.08.58 1.23.82.72 1.21 1.87.87 2.33.66.07-.52.28-.87.51-1.07-1.78-.2-3.64-.89-3.64-3.95 0-.87.31-1.59.82-2.15-.08-.2-.36-1.02.08-2.12 0 0 .67-.21 2.2.82.64-.18 1.32-.27 2-.27.68 0 1.36.09 2 .27 1.53-1.04 2.2-.82 2.2-.82.44 1.1.16 1.92.08 2.12.51.56.82 1.27.82 2.15 0 3.07-1.87 3.75-3.65 3.95.29.25.54.73.54 1.48 0 1.07-.01 1.93-.01 2.2 0 .21.15.46.55.38A8.012 8.012 0 0 0 16 8c0-4.42-3.58-8-8-8z"/>
+        </svg>
+        View Source Code on GitHub
+    </a>
+</div>
+"""
+
+# Feature highlight cards
+_FEATURES_HTML = """
+<div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 1rem; margin-bottom: 2rem;">
+    <div class="feature-card">
+        <h3 style="color: #667eea; margin-top: 0;">📊 INVEST Analysis</h3>
+        <p>Comprehensive evaluation against all 6 INVEST criteria with detailed scoring</p>
+    </div>
+    <div class="feature-card">
+        <h3 style="color: #667eea; margin-top: 0;">🤖 AI Insights</h3>
+        <p>Advanced AI analysis powered by OpenAI GPT for professional feedback</p>
+    </div>
+    <div class="feature-card">
+        <h3 style="color: #667eea; margin-top: 0;">✨ Story Improvement</h3>
+        <p>Get enhanced versions of your stories with better scope and clarity</p>
+    </div>
+</div>
+"""
+
+# Sample stories card
+_SAMPLES_HTML = """
+<div class="feature-card">
+    <h3 style="color: #667eea; margin-top: 0;">💡 Sample Stories to Try</h3>
+    <div style="background: #f8f9fa; padding: 1rem; border-radius: 6px; border-left: 4px solid #667eea;">
+        <p style="margin: 0.5rem 0;"><strong>Good Example:</strong> "As a customer, I want to view my order history so that I can track my purchases"</p>
+        <p style="margin: 0.5rem 0;"><strong>Needs Work:</strong> "As a user, I want a login feature"</p>
+        <p style="margin: 0.5rem 0;"><strong>Complex:</strong> "As a product manager, I want to see analytics so that I can make data-driven decisions"</p>
+    </div>
+</div>
+"""
+
+# Footer with usage guidelines
+_FOOTER_HTML = """
+<div style="margin-top: 3rem; padding: 2rem; background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%); border-radius: 10px;">
+    <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 2rem; text-align: center;">
+        <div>
+            <h4 style="color: #667eea; margin-bottom: 0.5rem;">⚡ Rate Limits</h4>
+            <p style="margin: 0; color: #6c757d;">10 requests/minute<br>100 requests/hour</p>
+        </div>
+        <div>
+            <h4 style="color: #667eea; margin-bottom: 0.5rem;">🎯 Purpose</h4>
+            <p style="margin: 0; color: #6c757d;">Professional Agile<br>story evaluation</p>
+        </div>
+        <div>
+            <h4 style="color: #667eea; margin-bottom: 0.5rem;">🤝 Respectful Use</h4>
+            <p style="margin: 0; color: #6c757d;">Please use responsibly<br>and don't abuse</p>
+        </div>
+    </div>
+    <div style="text-align: center; margin-top: 2rem; padding-top: 2rem; border-top: 1px solid rgba(102, 126, 234, 0.2);">
+        <a href="https://github.com/cadebryant/agile-story-evaluator" target="_blank" class="github-link-footer">
+            <svg width="20" height="20" fill="currentColor" viewBox="0 0 16 16">
+                <path d="M8 0C3.58 0 0 3.58 0 8c0 3.54 2.29 6.53 5.47 7.59.4.07.55-.17.55-.38 0-.19-.01-.82-.01-1.49-2.01.37-2.53-.49-2.69-.94-.09-.23-.48-.94-.82-1.13-.28-.15-.68-.52-.01-.53.63-.01 1.08.58 1.23.82.72 1.21 1.87.87 2.33.66.07-.52.28-.87.51-1.07-1.78-.2-3.64-.89-3.64-3.95 0-.87.31-1.59.82-2.15-.08-.2-.36-1.02.08-2.12 0 0 .67-.21 2.2.82.64-.18 1.32-.27 2-.27.68 0 1.36.09 2 .27 1.53-1.04 2.2-.82 2.2-.82.44 1.1.16 1.92.08 2.12.51.56.82 1.27.82 2.15 0 3.07-1.87 3.75-3.65 3.95.29.25.54.73.54 1.48 0 1.07-.01 1.93-.01 2.2 0 .21.15.46.55.38A8.012 8.012 0 0 0 16 8c0-4.42-3.58-8-8-8z"/>
+            </svg>
+            View Source Code on GitHub
+        </a>
+    </div>
+</div>
+"""
 
 def create_gradio_interface():
     """Create the Gradio web interface with rate limiting and CAPTCHA"""
     evaluator = INVESTEvaluator()
     
     def generate_captcha():
-        """Generate a simple math CAPTCHA"""
-        num1 = random.randint(1, 10)
-        num2 = random.randint(1, 10)
-        operation = random.choice(['+', '-', '*'])
-        
-        if operation == '+':
-            answer = num1 + num2
-            question = f"{num1} + {num2} = ?"
-        elif operation == '-':
-            # Ensure positive result
-            if num1 < num2:
-                num1, num2 = num2, num1
-            answer = num1 - num2
-            question = f"{num1} - {num2} = ?"
-        else:  # multiplication
-            answer = num1 * num2
-            question = f"{num1} × {num2} = ?"
-        
-        return question, answer  # Return both question and answer
+        """Pick a simple math CAPTCHA"""
+        return random.choice(_CAPTCHAS)  # (question, answer)
     
     def verify_captcha(user_answer, correct_answer):
         """Verify CAPTCHA answer"""
@@ -80,66 +316,57 @@ def create_gradio_interface():
         except (ValueError, TypeError):
             return False
     
-    def evaluate_story(story_text, captcha_answer, captcha_state):
+    def redraw_captcha(captcha_state):
+        """Put a new question in the session's state, unless it's locked out after too many failures"""
+        if captcha_state.get("failures", 0) <= _MAX_CAPTCHA_FAILURES:
+            captcha_state["question"], captcha_state["answer"] = generate_captcha()
+    
+    def evaluate_story(story_text, captcha_answer, captcha_state, request: gr.Request = None):
+        """Run the CAPTCHA, rate-limit and INVEST checks; the story is passed on for AI feedback only if they pass"""
+        # New CAPTCHAs are written into the session's state so its failure count and lockout carry over
         if not story_text.strip():
-            new_question, new_answer = generate_captcha()
-            new_state = {"question": new_question, "answer": new_answer}
-            return "Please enter a user story to evaluate.", "", "", new_question, new_state
+            redraw_captcha(captcha_state)
+            return "Please enter a user story to evaluate.", "", "", captcha_state["question"], captcha_state, ""
         
         # Verify CAPTCHA first - use the correct answer from state
         if not verify_captcha(captcha_answer, captcha_state["answer"]):
-            new_question, new_answer = generate_captcha()
-            new_state = {"question": new_question, "answer": new_answer}
-            return "❌ CAPTCHA verification failed. Please solve the math problem correctly.", "", "", new_question, new_state
-        
-        # Check rate limiting
-        if not evaluator.check_rate_limit():
-            new_question, new_answer = generate_captcha()
-            new_state = {"question": new_question, "answer": new_answer}
-            return "⚠️ Rate limit exceeded. Please wait before making more requests.", "", "", new_question, new_state
-        
-        # Use the base evaluation logic
-        criteria = evaluator.evaluate_invest_criteria(story_text)
-        
-        # Create detailed feedback
-        feedback_parts = []
-        total_score = 0
-        
-        for criterion, data in criteria.items():
-            score = data['score']
-            total_score += score
-            max_score = 3
+            current_time = time.time()
+            if current_time - captcha_state.get("first_failure", 0.0) >= _CAPTCHA_FAILURE_WINDOW:
+                captcha_state["first_failure"] = current_time
+                captcha_state["failures"] = 0
+            captcha_state["failures"] += 1
             
-            # Create score visualization
-            score_bars = "█" * score + "░" * (max_score - score)
-            
-            feedback_parts.append(f"**{criterion}**: {score_bars} ({score}/{max_score})")
-            feedback_parts.append(f"*{data['feedback']}*")
-            
-            if data['suggestions']:
-                feedback_parts.append("💡 Suggestions:")
-                for suggestion in data['suggestions']:
-                    feedback_parts.append(f"   • {suggestion}")
-            feedback_parts.append("")
-        
-        # Calculate overall score
-        overall_score = (total_score / (len(criteria) * 3)) * 100
-        score_emoji = "🟢" if overall_score >= 80 else "🟡" if overall_score >= 60 else "🔴"
-        
-        feedback = f"{score_emoji} **Overall INVEST Score: {overall_score:.1f}%**\n\n" + "\n".join(feedback_parts)
+            # Past the failure limit, keep the same question until it's solved or the window passes
+            redraw_captcha(captcha_state)
+            return "❌ CAPTCHA verification failed. Please solve the math problem correctly.", "", "", captcha_state["question"], captcha_state, ""
+        captcha_state.pop("first_failure", None)
+        captcha_state.pop("failures", None)
         
-        # Get AI analysis
-        ai_analysis = evaluator.get_ai_analysis(story_text)
+        # Check rate limiting - stories too short for AI analysis never reach OpenAI, so they don't count
+        # Limits apply per browser session (falling back to client address), within an overall cap for all users
+        user_id = "anonymous"
+        if request is not None:
+            user_id = request.session_hash or (request.client.host if request.client else user_id)
+        if not evaluator.too_short_for_ai(story_text) and not evaluator.check_rate_limit(user_id):
+            redraw_captcha(captcha_state)
+            return "⚠️ Rate limit exceeded. Please wait before making more requests.", "", "", captcha_state["question"], captcha_state, ""
         
-        # Get improved story
-        improved_story = evaluator.generate_improved_story(story_text)
+        # Use the base evaluation logic and formatting
+        feedback = format_invest_feedback(evaluator.evaluate_invest_criteria(story_text))
         
         # Generate new CAPTCHA for next evaluation
-        new_question, new_answer = generate_captcha()
-        captcha_state["question"] = new_question
-        captcha_state["answer"] = new_answer
+        captcha_state["question"], captcha_state["answer"] = generate_captcha()
         
-        return feedback, ai_analysis, improved_story, new_question, captcha_state
+        return feedback, "", "", captcha_state["question"], captcha_state, story_text
+    
+    async def ai_feedback(approved_story):
+        """Stream AI analysis and improved story for a story that passed the checks above"""
+        if not approved_story:
+            yield "", ""
+            return
+        
+        async for ai_analysis, improved_story in evaluator.combined_analysis(approved_story):
+            yield ai_analysis, improved_story
     
     # Create Gradio interface with modern theme
     with gr.Blocks(
@@ -149,141 +376,22 @@ def create_gradio_interface():
             secondary_hue="gray",
             neutral_hue="slate"
         ),
-        css="""
-        .gradio-container {
-            max-width: 1200px !important;
-            margin: 0 auto !important;
-            font-family: 'Inter', -apple-system, BlinkMacSystemFont, 'Segoe UI', sans-serif !important;
-        }
-        .main-header {
-            text-align: center;
-            padding: 2rem 0;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            border-radius: 15px;
-            margin-bottom: 2rem;
-            box-shadow: 0 8px 32px rgba(102, 126, 234, 0.3);
-        }
-        .feature-card {
-            background: white;
-            border-radius: 15px;
-            padding: 1.5rem;
-            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.08);
-            margin: 1rem 0;
-            border: 1px solid rgba(102, 126, 234, 0.1);
-            transition: transform 0.2s ease, box-shadow 0.2s ease;
-        }
-        .feature-card:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 8px 25px rgba(0, 0, 0, 0.15);
-        }
-        .captcha-section {
-            background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%);
-            border-radius: 10px;
-            padding: 1.5rem;
-            border: 2px solid #dee2e6;
-            margin: 1rem 0;
-        }
-        .evaluate-btn {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
-            border: none !important;
-            border-radius: 10px !important;
-            padding: 12px 24px !important;
-            font-weight: 600 !important;
-            font-size: 16px !important;
-            transition: all 0.3s ease !important;
-        }
-        .evaluate-btn:hover {
-            transform: translateY(-2px) !important;
-            box-shadow: 0 8px 25px rgba(102, 126, 234, 0.4) !important;
-        }
-        .results-section, .ai-section, .improved-section {
-            background: #f8f9fa;
-            border-radius: 10px;
-            padding: 1rem;
-            border-left: 4px solid #667eea;
-            min-height: 200px;
-        }
-        .gradio-textbox {
-            border-radius: 8px !important;
-            border: 2px solid #e9ecef !important;
-            transition: border-color 0.3s ease !important;
-        }
-        .gradio-textbox:focus {
-            border-color: #667eea !important;
-            box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1) !important;
-        }
-        .github-link {
-            color: rgba(255, 255, 255, 0.9) !important;
-            text-decoration: none !important;
-            font-size: 0.9rem !important;
-            display: inline-flex !important;
-            align-items: center !important;
-            gap: 0.5rem !important;
-            padding: 0.5rem 1rem !important;
-            background: rgba(255, 255, 255, 0.15) !important;
-            border-radius: 8px !important;
-            transition: all 0.3s ease !important;
-            margin-top: 1rem !important;
-        }
-        .github-link:hover {
-            background: rgba(255, 255, 255, 0.25) !important;
-            transform: translateY(-2px) !important;
-        }
-        .github-link-footer {
-            color: #667eea !important;
-            text-decoration: none !important;
-            font-weight: 600 !important;
-            display: inline-flex !important;
-            align-items: center !important;
-            gap: 0.5rem !important;
-            transition: all 0.3s ease !important;
-        }
-        .github-link-footer:hover {
-            color: #764ba2 !important;
-            transform: translateY(-2px) !important;
-        }
-        """
+        css=_CSS
     ) as interface:
         
         # Modern header
-        gr.HTML("""
-        <div class="main-header">
-            <h1 style="margin: 0; font-size: 2.5rem; font-weight: 700;">🎯 Agile Story Evaluator</h1>
-            <p style="margin: 0.5rem 0 0 0; font-size: 1.2rem; opacity: 0.9;">
-                Professional INVEST criteria analysis with AI-powered insights
-            </p>
-            <a href="https://github.com/cadebryant/agile-story-evaluator" target="_blank" class="github-link">
-                <svg width="16" height="16" fill="currentColor" viewBox="0 0 16 16" style="margin-right: 0.25rem;">
-                    <path d="M8 0C3.58 0 0 3.58 0 8c0 3.54 2.29 6.53 5.47 7.59.4.07.55-.17.55-.38 0-.19-.01-.82-.01-1.49-2.01.37-2.53-.49-2.69-.94-.09-.23-.48-.94-.82-1.13-.28-.15-.68-.52-.01-.53.63-.01 1.08.58 1.23.82.72 1.21 1.87.87 2.33.66.07-.52.28-.87.51-1.07-1.78-.2-3.64-.89-3.64-3.95 0-.87.31-1.59.82-2.15-.08-.2-.36-1.02.08-2.12 0 0 .67-.21 2.2.82.64-.18 1.32-.27 2-.27.68 0 1.36.09 2 .27 1.53-1.04 2.2-.82 2.2-.82.44 1.1.16 1.92.08 2.12.51.56.82 1.27.82 2.15 0 3.07-1.87 3.75-3.65 3.95.29.25.54.73.54 1.48 0 1.07-.01 1.93-.01 2.2 0 .21.15.46.55.38A8.012 8.012 0 0 0 16 8c0-4.42-3.58-8-8-8z"/>
-                </svg>
-                View Source Code on GitHub
-            </a>
-        </div>
-        """)
+        gr.HTML(_HEADER_HTML)
         
         # Feature highlights
-        gr.HTML("""
-        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 1rem; margin-bottom: 2rem;">
-            <div class="feature-card">
-                <h3 style="color: #667eea; margin-top: 0;">📊 INVEST Analysis</h3>
-                <p>Comprehensive evaluation against all 6 INVEST criteria with detailed scoring</p>
-            </div>
-            <div class="feature-card">
-                <h3 style="color: #667eea; margin-top: 0;">🤖 AI Insights</h3>
-                <p>Advanced AI analysis powered by OpenAI GPT for professional feedback</p>
-            </div>
-            <div class="feature-card">
-                <h3 style="color: #667eea; margin-top: 0;">✨ Story Improvement</h3>
-                <p>Get enhanced versions of your stories with better scope and clarity</p>
-            </div>
-        </div>
-        """)
+        gr.HTML(_FEATURES_HTML)
         
         # Initialize CAPTCHA state - this will be unique per user session
         initial_question, initial_answer = generate_captcha()
         captcha_state = gr.State({"question": initial_question, "answer": initial_answer})
         
+        # Story cleared for AI feedback by the last evaluation, empty if it was rejected
+        approved_story = gr.State("")
+        
         with gr.Row():
             with gr.Column(scale=2):
                 # Input section with modern styling
@@ -333,16 +441,7 @@ def create_gradio_interface():
                 gr.HTML("</div>")  # Close input card
                 
                 # Sample stories with better styling
-                gr.HTML("""
-                <div class="feature-card">
-                    <h3 style="color: #667eea; margin-top: 0;">💡 Sample Stories to Try</h3>
-                    <div style="background: #f8f9fa; padding: 1rem; border-radius: 6px; border-left: 4px solid #667eea;">
-                        <p style="margin: 0.5rem 0;"><strong>Good Example:</strong> "As a customer, I want to view my order history so that I can track my purchases"</p>
-                        <p style="margin: 0.5rem 0;"><strong>Needs Work:</strong> "As a user, I want a login feature"</p>
-                        <p style="margin: 0.5rem 0;"><strong>Complex:</strong> "As a product manager, I want to see analytics so that I can make data-driven decisions"</p>
-                    </div>
-                </div>
-                """)
+                gr.HTML(_SAMPLES_HTML)
             
             with gr.Column(scale=3):
                 # Results section with modern styling
@@ -388,11 +487,15 @@ def create_gradio_interface():
                 
                 gr.HTML("</div>")
         
-        # Event handlers
+        # Event handlers - show the INVEST score immediately, then stream the AI output
         evaluate_btn.click(
             fn=evaluate_story,
             inputs=[story_input, captcha_answer, captcha_state],
-            outputs=[invest_feedback, ai_analysis, improved_story, captcha_question, captcha_state]
+            outputs=[invest_feedback, ai_analysis, improved_story, captcha_question, captcha_state, approved_story]
+        ).then(
+            fn=ai_feedback,
+            inputs=[approved_story],
+            outputs=[ai_analysis, improved_story]
         )
         
         # Auto-evaluate on text change (with debouncing) - disabled to require CAPTCHA
@@ -403,32 +506,7 @@ def create_gradio_interface():
         # )
         
         # Modern footer with guidelines
-        gr.HTML("""
-        <div style="margin-top: 3rem; padding: 2rem; background: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%); border-radius: 10px;">
-            <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 2rem; text-align: center;">
-                <div>
-                    <h4 style="color: #667eea; margin-bottom: 0.5rem;">⚡ Rate Limits</h4>
-                    <p style="margin: 0; color: #6c757d;">10 requests/minute<br>100 requests/hour</p>
-                </div>
-                <div>
-                    <h4 style="color: #667eea; margin-bottom: 0.5rem;">🎯 Purpose</h4>
-                    <p style="margin: 0; color: #6c757d;">Professional Agile<br>story evaluation</p>
-                </div>
-                <div>
-                    <h4 style="color: #667eea; margin-bottom: 0.5rem;">🤝 Respectful Use</h4>
-                    <p style="margin: 0; color: #6c757d;">Please use responsibly<br>and don't abuse</p>
-                </div>
-            </div>
-            <div style="text-align: center; margin-top: 2rem; padding-top: 2rem; border-top: 1px solid rgba(102, 126, 234, 0.2);">
-                <a href="https://github.com/cadebryant/agile-story-evaluator" target="_blank" class="github-link-footer">
-                    <svg width="20" height="20" fill="currentColor" viewBox="0 0 16 16">
-                        <path d="M8 0C3.58 0 0 3.58 0 8c0 3.54 2.29 6.53 5.47 7.59.4.07.55-.17.55-.38 0-.19-.01-.82-.01-1.49-2.01.37-2.53-.49-2.69-.94-.09-.23-.48-.94-.82-1.13-.28-.15-.68-.52-.01-.53.63-.01 1.08.58 1.23.82.72 1.21 1.87.87 2.33.66.07-.52.28-.87.51-1.07-1.78-.2-3.64-.89-3.64-3.95 0-.87.31-1.59.82-2.15-.08-.2-.36-1.02.08-2.12 0 0 .67-.21 2.2.82.64-.18 1.32-.27 2-.27.68 0 1.36.09 2 .27 1.53-1.04 2.2-.82 2.2-.82.44 1.1.16 1.92.08 2.12.51.56.82 1.27.82 2.15 0 3.07-1.87 3.75-3.65 3.95.29.25.54.73.54 1.48 0 1.07-.01 1.93-.01 2.2 0 .21.15.46.55.38A8.012 8.012 0 0 0 16 8c0-4.42-3.58-8-8-8z"/>
-                    </svg>
-                    View Source Code on GitHub
-                </a>
-            </div>
-        </div>
-        """)
+        gr.HTML(_FOOTER_HTML)
     
     return interface
 
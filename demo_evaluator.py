@@ -3,64 +3,65 @@
 Standalone INVEST evaluator for demo purposes - no API key required
 """
 
+import io
 import re
+import sys
 from typing import Dict, List, Tuple
 
+# Story structure patterns, compiled once at import and matched against the lowercased story
+_USER_STORY_RE = re.compile(r'as\s+a\s+\w+.*?i\s+want\s+.*?so\s+that\s+.*')
+# Persona, action, value and criteria detection fused into one pass; group names are the analysis keys
+_STRUCTURE_RE = re.compile(
+    r'(?P<has_persona>as\s+(?:a|an|the)\s+(?=\w))'
+    r'|(?P<has_action>i\s+(?:want|need|can|should)\s+)'
+    r'|(?P<has_value>so\s+that\s+|in\s+order\s+to\s+|to\s+)'
+    r'|(?P<has_acceptance_criteria>given\s+|when\s+|then\s+|acceptance\s+criteria|criteria:)'
+)
+
+# Keywords for the Independent and Negotiable checks, looked up in the story's set of lowercase words
+_WORD_RE = re.compile(r'[a-z]+')
+_DEPENDENCY_TERMS = frozenset({'depends', 'requires', 'after', 'before'})
+_RIGID_TERMS = frozenset({'must', 'shall', 'will', 'exactly', 'precisely', 'specifically'})
+
 class DemoINVESTEvaluator:
     """
     Evaluates user stories against INVEST criteria without requiring API keys
     """
     
-    def analyze_story_structure(self, story: str) -> Dict[str, any]:
-        """Analyze the basic structure of the user story"""
+    def analyze_story_structure(self, story: str, story_lc: str = None, tokens: List[str] = None) -> Dict[str, any]:
+        """Analyze the basic structure of the user story; pass story_lc and tokens if the lowercased story and its words are already at hand"""
+        if story_lc is None:
+            story_lc = story.lower()
+        if tokens is None:
+            tokens = story_lc.split()
+        
         analysis = {
             'has_persona': False,
             'has_action': False,
             'has_value': False,
             'has_acceptance_criteria': False,
-            'word_count': len(story.split()),
-            'sentence_count': len(re.split(r'[.!?]+', story)),
+            'word_count': len(tokens),
+            'sentence_count': 1 + sum(map(story.count, '.!?')),
             'has_user_story_format': False
         }
         
         # Check for user story format: "As a [persona], I want [action] so that [value]"
-        user_story_pattern = r'as\s+a\s+\w+.*?i\s+want\s+.*?so\s+that\s+.*'
-        if re.search(user_story_pattern, story.lower()):
+        if _USER_STORY_RE.search(story_lc):
             analysis['has_user_story_format'] = True
             
-        # Check for persona
-        persona_patterns = [r'as\s+a\s+(\w+)', r'as\s+an\s+(\w+)', r'as\s+the\s+(\w+)']
-        for pattern in persona_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_persona'] = True
-                break
-                
-        # Check for action (want/need)
-        action_patterns = [r'i\s+want\s+', r'i\s+need\s+', r'i\s+can\s+', r'i\s+should\s+']
-        for pattern in action_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_action'] = True
-                break
-                
-        # Check for value proposition
-        value_patterns = [r'so\s+that\s+', r'in\s+order\s+to\s+', r'to\s+']
-        for pattern in value_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_value'] = True
-                break
-                
-        # Check for acceptance criteria
-        criteria_patterns = [r'given\s+', r'when\s+', r'then\s+', r'acceptance\s+criteria', r'criteria:']
-        for pattern in criteria_patterns:
-            if re.search(pattern, story.lower()):
-                analysis['has_acceptance_criteria'] = True
-                break
+        # Check for persona, action (want/need), value proposition and acceptance criteria
+        for match in _STRUCTURE_RE.finditer(story_lc):
+            analysis[match.lastgroup] = True
                 
         return analysis
     
     def evaluate_invest_criteria(self, story: str) -> Dict[str, Dict]:
         """Evaluate the story against each INVEST criterion"""
-        structure = self.analyze_story_structure(story)
+        # Lowercase and tokenize once; the structure analysis reuses both
+        story_lc = story.lower()
+        tokens = story_lc.split()
+        structure = self.analyze_story_structure(story, story_lc, tokens)
+        words = frozenset(_WORD_RE.findall(story_lc))
         
         criteria = {
             'Independent': {
@@ -96,7 +97,7 @@ class DemoINVESTEvaluator:
         }
         
         # Independent: Check if story can stand alone
-        if structure['has_user_story_format'] and not any(word in story.lower() for word in ['depends on', 'requires', 'after', 'before']):
+        if structure['has_user_story_format'] and words.isdisjoint(_DEPENDENCY_TERMS):
             criteria['Independent']['score'] = 3
             criteria['Independent']['feedback'] = "Story appears to be independent"
         elif structure['has_user_story_format']:
@@ -109,8 +110,7 @@ class DemoINVESTEvaluator:
             criteria['Independent']['suggestions'].append("Use standard user story format: 'As a [persona], I want [action] so that [value]'")
         
         # Negotiable: Check for flexibility
-        rigid_terms = ['must', 'shall', 'will', 'exactly', 'precisely', 'specifically']
-        if any(term in story.lower() for term in rigid_terms):
+        if not words.isdisjoint(_RIGID_TERMS):
             criteria['Negotiable']['score'] = 1
             criteria['Negotiable']['feedback'] = "Story contains rigid language that limits negotiation"
             criteria['Negotiable']['suggestions'].append("Use more flexible language like 'should' or 'could'")
@@ -175,6 +175,10 @@ class DemoINVESTEvaluator:
             criteria['Testable']['suggestions'].append("Add clear actions and acceptance criteria")
         
         return criteria
+    
+    def evaluate_batch(self, stories: List[str]) -> List[Dict[str, Dict]]:
+        """Evaluate several stories in one call, e.g. a whole backlog"""
+        return [self.evaluate_invest_criteria(story) for story in stories]
 
 def demo_invest_evaluation():
     """Demonstrate the INVEST evaluation without API calls"""
@@ -200,20 +204,22 @@ def demo_invest_evaluation():
         }
     ]
     
-    print("Agile Story Evaluator - Demo")
-    print("=" * 60)
-    print("This demo shows INVEST criteria evaluation without AI analysis.")
-    print("For full AI-powered feedback, add your OpenAI API key to .env file")
-    print("=" * 60)
+    # Collect the report in memory and write it out in one go
+    out = io.StringIO()
     
-    for i, test_case in enumerate(test_stories, 1):
-        print(f"\n{i}. {test_case['title']}")
-        print("-" * 40)
-        print(f"Story: '{test_case['story']}'")
-        print()
-        
-        # Get INVEST evaluation
-        criteria = evaluator.evaluate_invest_criteria(test_case['story'])
+    print("Agile Story Evaluator - Demo", file=out)
+    print("=" * 60, file=out)
+    print("This demo shows INVEST criteria evaluation without AI analysis.", file=out)
+    print("For full AI-powered feedback, add your OpenAI API key to .env file", file=out)
+    print("=" * 60, file=out)
+    
+    results = evaluator.evaluate_batch([test_case['story'] for test_case in test_stories])
+    
+    for i, (test_case, criteria) in enumerate(zip(test_stories, results), 1):
+        print(f"\n{i}. {test_case['title']}", file=out)
+        print("-" * 40, file=out)
+        print(f"Story: '{test_case['story']}'", file=out)
+        print(file=out)
         
         # Display results
         total_score = 0
@@ -225,25 +231,27 @@ def demo_invest_evaluation():
             # Create visual score
             score_bars = "X" * score + "-" * (max_score - score)
             
-            print(f"{criterion:12} {score_bars} ({score}/{max_score})")
-            print(f"             {data['feedback']}")
+            print(f"{criterion:12} {score_bars} ({score}/{max_score})", file=out)
+            print(f"             {data['feedback']}", file=out)
             
             if data['suggestions']:
                 for suggestion in data['suggestions']:
-                    print(f"             -> {suggestion}")
-            print()
+                    print(f"             -> {suggestion}", file=out)
+            print(file=out)
         
         # Calculate overall score
         overall_score = (total_score / (len(criteria) * 3)) * 100
         score_indicator = "EXCELLENT" if overall_score >= 80 else "GOOD" if overall_score >= 60 else "NEEDS WORK"
         
-        print(f"Overall Score: {score_indicator} ({overall_score:.1f}%)")
-        print("=" * 60)
+        print(f"Overall Score: {score_indicator} ({overall_score:.1f}%)", file=out)
+        print("=" * 60, file=out)
+    
+    print("\nDemo completed! To run the full application with AI analysis:", file=out)
+    print("1. Get an OpenAI API key from: https://platform.openai.com/api-keys", file=out)
+    print("2. Create a .env file with: OPENAI_API_KEY=your_key_here", file=out)
+    print("3. Run: python agile_story_evaluator.py", file=out)
     
-    print("\nDemo completed! To run the full application with AI analysis:")
-    print("1. Get an OpenAI API key from: https://platform.openai.com/api-keys")
-    print("2. Create a .env file with: OPENAI_API_KEY=your_key_here")
-    print("3. Run: python agile_story_evaluator.py")
+    sys.stdout.write(out.getvalue())
 
 if __name__ == "__main__":
     demo_invest_evaluation()
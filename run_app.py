@@ -3,20 +3,19 @@
 Startup script for Agile Story Evaluator
 """
 
+import importlib.util
 import os
 import sys
 
 def check_requirements():
     """Check if all requirements are installed"""
-    try:
-        import gradio
-        import openai
-        from dotenv import load_dotenv
-        return True
-    except ImportError as e:
-        print(f"Missing dependency: {e}")
+    # find_spec locates the packages without importing them; gradio alone takes seconds to import
+    missing = [name for name in ("gradio", "openai", "dotenv") if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"Missing dependency: {', '.join(missing)}")
         print("Please install requirements: pip install -r requirements.txt")
         return False
+    return True
 
 def check_api_key():
     """Check if OpenAI API key is configured"""